@@ -1,11 +1,40 @@
 import os
+import pathlib
 import sys
+import time
+import random
+import asyncio
+import itertools
 import httpx
-import json
+import orjson
+import xxhash
 import logging
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager, suppress
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from cachetools import LRUCache, TLRUCache, TTLCache
+import anyio
 from dotenv import load_dotenv
 
+from graphql import GraphQLError, Visitor, parse, print_ast, visit
+from graphql.language import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    NameNode,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+)
+
+# uvloop is optional (not available on Windows); when present the server's
+# event loop runs on it
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -28,80 +57,686 @@ if not GITHUB_TOKEN:
 else:
     logging.info(f"Successfully loaded GitHub token starting with: {GITHUB_TOKEN[:4]}")
 
+# Token-derived values are computed once rather than on every request
+_HAS_TOKEN = bool(GITHUB_TOKEN)
+_AUTH_HEADER = f"Bearer {GITHUB_TOKEN}".encode() if GITHUB_TOKEN else None
+
+# Constant error responses, serialized once
+_ERR_MISSING_TOKEN = orjson.dumps({"errors": [{"message": "Server missing GitHub API token."}]}).decode()
+_ERR_EMPTY_QUERY = orjson.dumps({"errors": [{"message": "Query cannot be empty."}]}).decode()
+
 # GitHub GraphQL API Endpoint
 GITHUB_GRAPHQL_API_URL = "https://api.github.com/graphql"
 
+# Opt-in query batching: queries arriving within this window (milliseconds) are
+# merged into one aliased request. 0 disables batching.
+BATCH_WINDOW_MS = float(os.environ.get("GITHUB_GRAPHQL_BATCH_WINDOW_MS", "0"))
+BATCH_MAX_SIZE = int(os.environ.get("GITHUB_GRAPHQL_BATCH_MAX_SIZE", "10"))
+
+# How long (seconds) successful read-only query responses are cached. Any
+# mutation clears the cache. 0 disables caching of non-introspection queries.
+CACHE_TTL = float(os.environ.get("GITHUB_GRAPHQL_CACHE_TTL", "300"))
+
+# Client-side throttling: cap concurrent requests, spread the remaining budget
+# over the reset window once it runs low, and wait out rate-limit responses
+# that reset within MAX_RATE_LIMIT_WAIT seconds.
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("GITHUB_GRAPHQL_MAX_CONCURRENCY", "16"))
+RATE_LIMIT_THRESHOLD = 100
+MAX_RATE_LIMIT_WAIT = 60.0
+# Transient failures (network errors, 429 and gateway errors) are retried
+# with jittered exponential backoff up to MAX_ATTEMPTS times in total
+MAX_ATTEMPTS = 3
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+# Responses larger than this many bytes are (de)serialized in a worker thread
+# so multi-MB payloads don't stall other tool calls on the event loop
+LARGE_RESPONSE_BYTES = 512_000
+# Only every Nth rate-limit status is logged while the budget is healthy
+RATE_LIMIT_LOG_INTERVAL = 32
+
+# Shared HTTP client, created lazily inside the running event loop so the
+# connection pool (and its TLS sessions) is reused across tool invocations.
+_client: Optional[httpx.AsyncClient] = None
+
+def _get_client() -> httpx.AsyncClient:
+    """
+    Returns the shared AsyncClient, creating it on first use.
+    Static headers are baked into the client so they are not rebuilt per call.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+            headers={
+                "User-Agent": "MCPGitHubServer/0.1.0",
+                "Authorization": _AUTH_HEADER,
+                "Content-Type": "application/json",
+                # GraphQL JSON compresses very well; decoders come from the
+                # httpx brotli/zstd extras
+                "Accept-Encoding": "gzip, br, zstd"
+            }
+        )
+    return _client
+
+async def _warmup() -> None:
+    """
+    Issues a trivial query so DNS, TLS and the HTTP/2 connection to GitHub are
+    established before the first tool call arrives.
+    """
+    _, result = await make_github_request("query { viewer { login } }", is_mutation=False)
+    if result is not None and "errors" in result:
+        logging.warning("GitHub connection warmup failed.")
+    else:
+        logging.info("GitHub connection warmed up.")
+
+@asynccontextmanager
+async def server_lifespan(server: Any) -> AsyncIterator[None]:
+    """
+    Loads persisted introspection results and warms up the shared HTTP client
+    on startup, and closes the client when the MCP server shuts down.
+    """
+    global _client
+    await asyncio.to_thread(_load_persisted_introspection)
+    # Run in the server's own event loop (the pool is bound to it) without
+    # delaying the MCP handshake.
+    warmup_task = asyncio.create_task(_warmup())
+    try:
+        yield
+    finally:
+        # Let a cancelled warmup finish unwinding before its client is closed
+        warmup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup_task
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+            logging.info("Closed shared GitHub HTTP client.")
+
+# Response cache for read-only queries. Introspection results change only when
+# GitHub ships a schema update, so they are kept much longer.
+# Both caches are sized by response length rather than entry count, since a
+# single response can be several MB; larger responses are never cached.
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+INTROSPECTION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+MAX_CACHED_RESPONSE_BYTES = 16 * 1024 * 1024
+# Cache entries keep the query text and variables alongside the response and
+# are compared on every hit, so a fingerprint collision can never serve another
+# query's data. Read cache entries are (query, variables, response_json).
+_cache: TTLCache = TTLCache(maxsize=CACHE_MAX_BYTES, ttl=max(CACHE_TTL, 1),
+                            getsizeof=lambda entry: len(entry[0]) + len(entry[2]))
+# Bumped by every mutation so reads that started before it don't cache
+# pre-mutation data
+_cache_generation = 0
+INTROSPECTION_TTL = 6 * 3600
+# Entries are (written_at, query, variables, response_json) and expire
+# INTROSPECTION_TTL after they were fetched, including entries reloaded from
+# disk on startup
+_introspection_cache: TLRUCache = TLRUCache(
+    maxsize=INTROSPECTION_CACHE_MAX_BYTES, ttu=lambda _key, entry, _now: entry[0] + INTROSPECTION_TTL,
+    timer=time.time, getsizeof=lambda entry: len(entry[1]) + len(entry[3]))
+# Introspection results are also persisted here so they survive restarts
+_INTROSPECTION_PATH = pathlib.Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "github-graphql-mcp"
+# Outstanding requests keyed like the cache, so concurrent identical queries
+# share a single round-trip to GitHub (singleflight).
+# Values are (query, variables, task).
+_inflight: Dict[Tuple[int, int], Tuple[str, Dict[str, Any], asyncio.Task]] = {}
+_INTROSPECTION_FIELDS = frozenset(("__schema", "__type", "__typename"))
+# Per-fingerprint classification (query, is_mutation, is_introspection), so
+# each distinct query text is only analysed once
+_query_kinds: LRUCache = LRUCache(maxsize=1024)
+
+def _fingerprint(data: bytes) -> int:
+    return xxhash.xxh3_64_intdigest(data)
+
+def _analyse_query(query: str) -> Tuple[bool, bool]:
+    """
+    Parses a query and returns (is_mutation, is_introspection).
+
+    Any operation other than a query counts as a mutation. So does a document
+    that fails to parse, so it skips the cache, singleflight and unsafe
+    retries. A query is introspection only when every root selection of every
+    operation is __schema, __type or __typename. Queries that also select
+    real data are user-specific and must not get the long TTL or be written
+    to disk.
+    """
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return True, False
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    is_mutation = any(operation.operation != OperationType.QUERY for operation in operations)
+    is_introspection = bool(operations) and not is_mutation and all(
+        isinstance(sel, FieldNode) and sel.name.value in _INTROSPECTION_FIELDS
+        for operation in operations
+        for sel in operation.selection_set.selections
+    )
+    return is_mutation, is_introspection
+
+def _classify_query(query: str) -> Tuple[int, bool, bool]:
+    """
+    Returns the query's fingerprint and whether it is a mutation and/or an
+    introspection query.
+    """
+    fingerprint = _fingerprint(query.encode())
+    entry = _query_kinds.get(fingerprint)
+    if entry is None or entry[0] != query:
+        entry = _query_kinds[fingerprint] = (query, *_analyse_query(query))
+    return (fingerprint, entry[1], entry[2])
+
+# Most queries (including introspection) have no variables, so that case skips
+# canonicalization entirely
+_EMPTY_VARIABLES_HASH = _fingerprint(b"{}")
+
+def _cache_key(fingerprint: int, variables: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Builds a cache key from the query fingerprint and canonicalized variables.
+    Variables are canonicalized with orjson's sorted-key encoding, which is
+    faster than a hand-written Python encoder for the small dicts seen here.
+    """
+    if not variables:
+        return fingerprint, _EMPTY_VARIABLES_HASH
+    return fingerprint, _fingerprint(orjson.dumps(variables, option=orjson.OPT_SORT_KEYS))
+
+# Rate-limit state reported by the most recent GitHub response
+_rl: Dict[str, Any] = {"remaining": None, "reset": 0}
+_request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+_log_counter = itertools.count()
+
+def _update_rate_limit(response: httpx.Response) -> None:
+    """
+    Records the rate-limit budget reported in GitHub's response headers and
+    logs it (sampled while the budget is healthy). The remaining count is
+    parsed once here and reused for both.
+    """
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    reset = response.headers.get('X-RateLimit-Reset')
+    if reset is not None and reset.isdigit():
+        _rl["reset"] = int(reset)
+    if remaining is None or not remaining.isdigit():
+        return
+    remaining_count = _rl["remaining"] = int(remaining)
+
+    rate_low = remaining_count < 50
+    if rate_low or next(_log_counter) % RATE_LIMIT_LOG_INTERVAL == 0:
+        # Lazy %-formatting: arguments are only rendered if the record is emitted
+        logging.info("GitHub Rate Limit: %s/%s remaining. Resets at timestamp %s.",
+                     remaining, response.headers.get('X-RateLimit-Limit'), reset)
+    if rate_low:
+        logging.warning("GitHub Rate Limit low: %d remaining.", remaining_count)
+
+async def _pace_request() -> None:
+    """
+    Spreads requests over the time left until the rate limit resets once the
+    remaining budget drops below RATE_LIMIT_THRESHOLD.
+    """
+    remaining = _rl["remaining"]
+    if remaining is not None and remaining < RATE_LIMIT_THRESHOLD:
+        delay = max(0.0, _rl["reset"] - time.time()) / max(1, remaining)
+        if delay > 0:
+            logging.debug(f"Pacing GitHub request by {delay:.2f}s ({remaining} requests remaining).")
+            await asyncio.sleep(min(delay, MAX_RATE_LIMIT_WAIT))
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header given either as seconds or as an HTTP date.
+    """
+    if value is None:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def _rate_limit_wait(response: httpx.Response) -> Optional[float]:
+    """
+    Returns how long to wait before retrying a rate-limited response (primary
+    limit exhausted or secondary limit hit), or None if GitHub gave no hint.
+    """
+    if response.status_code not in (403, 429):
+        return None
+    retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+    if retry_after is not None:
+        return retry_after
+    if response.headers.get('X-RateLimit-Remaining') == "0":
+        return max(0.0, _rl["reset"] - time.time())
+    return None
+
+def _backoff_delay(attempt: int) -> float:
+    return min(2 ** attempt * 0.25 + random.random() * 0.1, 4.0)
+
+async def _post_with_retries(content: bytes, is_mutation: bool) -> httpx.Response:
+    """
+    POSTs a GraphQL payload, retrying network errors, rate-limit responses and
+    gateway errors. Mutations are only retried when GitHub cannot have run
+    them (connection failures and rate-limit rejections).
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        last_attempt = attempt == MAX_ATTEMPTS - 1
+        await _pace_request()
+        try:
+            # Only the request itself counts against the concurrency cap, not
+            # pacing or retry sleeps
+            async with _request_semaphore:
+                response = await _get_client().post(GITHUB_GRAPHQL_API_URL, content=content)
+        except httpx.RequestError as e:
+            if last_attempt or (is_mutation and not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))):
+                raise
+            delay = _backoff_delay(attempt)
+            logging.warning(f"HTTP Request Error: {e}; retrying in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            continue
+
+        _update_rate_limit(response)
+        wait = _rate_limit_wait(response)
+        if wait is None and response.status_code in RETRY_STATUS_CODES:
+            if is_mutation and response.status_code != 429:
+                return response
+            wait = _backoff_delay(attempt)
+        if wait is None or last_attempt or wait > MAX_RATE_LIMIT_WAIT:
+            return response
+        logging.warning(f"GitHub returned HTTP {response.status_code}; retrying in {wait:.1f}s.")
+        await asyncio.sleep(wait)
+
+def _persist_introspection(key: Tuple[int, int], query: str, variables: Dict[str, Any], body: bytes) -> None:
+    """
+    Writes an introspection response to the on-disk cache. The first line of
+    the file holds the query and variables so they can be checked on load.
+    """
+    path = _INTROSPECTION_PATH / f"introspection-{key[0]:016x}{key[1]:016x}.entry"
+    try:
+        _INTROSPECTION_PATH.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(orjson.dumps({"query": query, "variables": variables}) + b"\n" + body)
+        tmp_path.replace(path)
+    except OSError as e:
+        logging.warning(f"Could not persist introspection result to {path}: {e}")
+
+def _load_persisted_introspection() -> None:
+    """
+    Loads introspection responses persisted by earlier runs into the in-memory
+    cache, deleting entries older than INTROSPECTION_TTL so schema changes are
+    picked up.
+    """
+    if not _INTROSPECTION_PATH.is_dir():
+        return
+    now = time.time()
+    for path in _INTROSPECTION_PATH.glob("introspection-*.entry"):
+        try:
+            stat = path.stat()
+            written_at = stat.st_mtime
+            if stat.st_size > MAX_CACHED_RESPONSE_BYTES:
+                continue
+            if now - written_at > INTROSPECTION_TTL:
+                path.unlink()
+                continue
+            digest = path.stem[len("introspection-"):]
+            key = (int(digest[:16], 16), int(digest[16:], 16))
+            header, _, body = path.read_bytes().partition(b"\n")
+            identity = orjson.loads(header)
+            _introspection_cache[key] = (written_at, identity["query"], identity["variables"], body.decode())
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Skipping persisted introspection result {path}: {e}")
+    logging.info(f"Loaded {len(_introspection_cache)} persisted introspection result(s).")
+
 from mcp.server.fastmcp import FastMCP
-mcp = FastMCP("github-graphql", version="0.1.0")
+mcp = FastMCP("github-graphql", lifespan=server_lifespan)
 logging.info("GitHub GraphQL MCP Server initialized.")
 
-async def make_github_request(query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+async def _loads(body: bytes) -> Any:
+    """
+    Parses JSON, off the event loop when the body is large.
+    """
+    if len(body) > LARGE_RESPONSE_BYTES:
+        return await asyncio.to_thread(orjson.loads, body)
+    return orjson.loads(body)
+
+async def _decode(body: bytes) -> str:
+    """
+    Decodes a UTF-8 response body, off the event loop when it is large.
+    """
+    if len(body) > LARGE_RESPONSE_BYTES:
+        return await asyncio.to_thread(body.decode)
+    return body.decode()
+
+def _error_response(message: str) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Builds a GraphQL-style error response as (JSON bytes, parsed dict).
+    """
+    result = {"errors": [{"message": message}]}
+    return orjson.dumps(result), result
+
+async def make_github_request(query: str, variables: Optional[Dict[str, Any]] = None,
+                              is_mutation: bool = True) -> Tuple[bytes, Optional[Dict[str, Any]]]:
     """
     Makes an authenticated GraphQL request to the GitHub API.
     Handles authentication and error checking.
+
+    Callers that know the query is read-only pass is_mutation=False so
+    gateway errors can be retried; the default assumes side effects.
+
+    Returns the raw JSON response body together with its parsed form. The body
+    is only parsed when it may contain an "errors" entry, so the parsed dict is
+    None for plain successful responses.
     """
-    if not GITHUB_TOKEN:
+    if not _HAS_TOKEN:
         logging.error("GitHub API token is missing. Cannot make request.")
-        return {"errors": [{"message": "Server missing GitHub API token."}]}
+        return _error_response("Server missing GitHub API token.")
 
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Content-Type": "application/json",
-        "User-Agent": "MCPGitHubServer/0.1.0"
-    }
-
-    payload = {"query": query}
-    if variables:
-        payload["variables"] = variables
+    payload = {"query": query, "variables": variables} if variables else {"query": query}
+    debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
 
-    async with httpx.AsyncClient() as client:
-        try:
+    try:
+        if debug_enabled:
             logging.debug(f"Sending request to GitHub: {query[:100]}...")
-            response = await client.post(
-                GITHUB_GRAPHQL_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
-
-            # Log Rate Limit Info
-            rate_limit = response.headers.get('X-RateLimit-Limit')
-            rate_remaining = response.headers.get('X-RateLimit-Remaining')
-            rate_reset = response.headers.get('X-RateLimit-Reset')
-            if rate_limit is not None and rate_remaining is not None:
-                 logging.info(f"GitHub Rate Limit: {rate_remaining}/{rate_limit} remaining. Resets at timestamp {rate_reset}.")
-                 if int(rate_remaining) < 50:
-                     logging.warning(f"GitHub Rate Limit low: {rate_remaining} remaining.")
-
-            response.raise_for_status()
+        response = await _post_with_retries(orjson.dumps(payload), is_mutation)
+
+        response.raise_for_status()
+        if debug_enabled:
             logging.debug(f"GitHub response status: {response.status_code}")
-            result = response.json()
-            # Check for GraphQL errors within the response body
+        body = response.content
+        # Anything other than a JSON object (e.g. an HTML page from a proxy) is
+        # an error, and must not be passed through or cached
+        content_type = response.headers.get("content-type", "")
+        if (content_type and "json" not in content_type) or body.lstrip()[:1] != b"{":
+            logging.error(f"Unexpected non-JSON response from GitHub (HTTP {response.status_code}, content-type {content_type!r}).")
+            return _error_response(f"Unexpected non-JSON response from GitHub (content-type {content_type!r}).")
+        # Check for GraphQL errors within the response body, using a cheap
+        # byte scan before paying for a full parse
+        result = None
+        if b'"errors"' in body:
+            result = await _loads(body)
             if "errors" in result:
                 logging.warning(f"GraphQL Errors: {result['errors']}")
-            return result
-        except httpx.RequestError as e:
-            logging.error(f"HTTP Request Error: {e}", exc_info=True)
-            return {"errors": [{"message": f"HTTP Request Error connecting to GitHub: {e}"}]}
-        except httpx.HTTPStatusError as e:
-            logging.error(f"HTTP Status Error: {e.response.status_code} - Response: {e.response.text[:500]}", exc_info=True)
-            error_detail = f"HTTP Status Error: {e.response.status_code}"
+        return body, result
+    except httpx.RequestError as e:
+        logging.error(f"HTTP Request Error: {e}", exc_info=True)
+        return _error_response(f"HTTP Request Error connecting to GitHub: {e}")
+    except httpx.HTTPStatusError as e:
+        logging.error(f"HTTP Status Error: {e.response.status_code} - Response: {e.response.content[:500].decode(errors='replace')}", exc_info=True)
+        error_detail = f"HTTP Status Error: {e.response.status_code}"
+        # Try to parse GitHub's error response if JSON (5xx pages are HTML).
+        # Only the leading message is needed, so large bodies aren't parsed in
+        # full; a body truncated mid-document just yields no detail.
+        if e.response.headers.get("content-type", "").startswith("application/json"):
             try:
-                # Try to parse GitHub's error response if JSON
-                err_resp = e.response.json()
-                if "errors" in err_resp:
-                    error_detail += f" - {err_resp['errors'][0]['message']}"
-                elif "message" in err_resp:
-                    error_detail += f" - {err_resp['message']}"
+                err_resp = orjson.loads(e.response.content[:4096])
+            except orjson.JSONDecodeError:
+                err_resp = None
+            if isinstance(err_resp, dict):
+                errors = err_resp.get("errors")
+                message = (errors[0].get("message") if errors and isinstance(errors[0], dict) else None) or err_resp.get("message")
+                if message:
+                    error_detail += f" - {str(message)[:256]}"
+
+        return _error_response(error_detail)
+    except Exception as e:
+        logging.error(f"Generic Error during GitHub request: {e}", exc_info=True)
+        return _error_response(f"An unexpected error occurred: {e}")
+
+def _replace_node(node, **changes):
+    """
+    Returns a copy of an AST node with some fields replaced (nodes are
+    immutable in newer graphql-core releases).
+    """
+    fields = {key: getattr(node, key) for key in node.keys}
+    fields.update(changes)
+    return node.__class__(**fields)
+
+class _BatchRenamer(Visitor):
+    """
+    Prefixes variable and fragment names so several documents can be merged
+    into one operation without name collisions.
+    """
+    def __init__(self, prefix: str):
+        super().__init__()
+        self.prefix = prefix
+
+    def _rename(self, node):
+        return _replace_node(node, name=NameNode(value=self.prefix + node.name.value))
+
+    def enter_variable(self, node, *_):
+        return self._rename(node)
+
+    def enter_fragment_spread(self, node, *_):
+        return self._rename(node)
+
+    def enter_fragment_definition(self, node, *_):
+        return self._rename(node)
+
+# Pending batched queries: (query, parsed document, variables, result future)
+_batch_queue: List[Tuple[str, DocumentNode, Dict[str, Any], asyncio.Future]] = []
+_batch_timer: Optional[asyncio.Task] = None
+_batch_tasks: Set[asyncio.Task] = set()
+# (query, parsed batchable document or None) keyed by fingerprint
+_batch_documents: LRUCache = LRUCache(maxsize=256)
+
+def _parse_batchable(query: str) -> Optional[DocumentNode]:
+    """
+    Parses a query and returns its document if it can be safely merged into a
+    batch: a single query operation without operation-level directives whose
+    root selections are all plain fields. Returns None otherwise.
+    """
+    try:
+        document = parse(query)
+    except GraphQLError:
+        # Let GitHub report the syntax error for this query alone
+        return None
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    if len(operations) != 1:
+        return None
+    operation = operations[0]
+    if operation.operation != OperationType.QUERY or operation.directives:
+        return None
+    if not all(isinstance(sel, FieldNode) for sel in operation.selection_set.selections):
+        return None
+    return document
+
+def _merge_batch(batch: List[Tuple[str, DocumentNode, Dict[str, Any], asyncio.Future]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Combines the batched documents into a single query, prefixing each one's
+    root field aliases, variables and fragments with gh{i}_.
+    """
+    variable_definitions = []
+    selections = []
+    fragments = []
+    merged_variables: Dict[str, Any] = {}
+    for i, (_, document, variables, _) in enumerate(batch):
+        prefix = f"gh{i}_"
+        renamed = visit(document, _BatchRenamer(prefix))
+        for definition in renamed.definitions:
+            if isinstance(definition, FragmentDefinitionNode):
+                fragments.append(definition)
+                continue
+            for var_def in definition.variable_definitions or ():
+                variable_definitions.append(var_def)
+                name = var_def.variable.name.value[len(prefix):]
+                if name in variables:
+                    merged_variables[prefix + name] = variables[name]
+            for field in definition.selection_set.selections:
+                alias = NameNode(value=prefix + (field.alias or field.name).value)
+                selections.append(_replace_node(field, alias=alias))
+
+    operation = OperationDefinitionNode(
+        operation=OperationType.QUERY,
+        name=NameNode(value="BatchedQuery"),
+        variable_definitions=tuple(variable_definitions),
+        directives=(),
+        selection_set=SelectionSetNode(selections=tuple(selections)),
+    )
+    return print_ast(DocumentNode(definitions=(operation, *fragments))), merged_variables
+
+def _split_batch_result(result: Dict[str, Any], size: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Splits a merged response back into per-query results by alias prefix.
+    Returns None if an error cannot be attributed to a single query, or if
+    data is null (an error in one query nulled the whole merged response).
+    """
+    data = result.get("data")
+    if data is None:
+        return None
+    results: List[Dict[str, Any]] = [{"data": {}} for _ in range(size)]
+    for key, value in data.items():
+        index, _, name = key[2:].partition("_")
+        results[int(index)]["data"][name] = value
+    for error in result.get("errors", ()):
+        path = error.get("path")
+        if not path or not isinstance(path[0], str) or not path[0].startswith("gh"):
+            return None
+        index, _, name = path[0][2:].partition("_")
+        # Locations point into the merged document, not the caller's query
+        split_error = {k: v for k, v in error.items() if k != "locations"}
+        split_error["path"] = [name, *path[1:]]
+        results[int(index)].setdefault("errors", []).append(split_error)
+    return results
+
+def _is_request_failure(result: Dict[str, Any]) -> bool:
+    """
+    Returns True when a merged request failed for reasons unrelated to which
+    queries it contained: transport, HTTP status or non-JSON errors (bare
+    message-only errors from make_github_request or GitHub's generic
+    execution failures) and GitHub rate limiting. Re-sending the queries
+    individually would only multiply the load.
+    """
+    return any(
+        error.get("type") == "RATE_LIMITED" or set(error) == {"message"}
+        for error in result.get("errors", ())
+        if isinstance(error, dict)
+    )
+
+async def _send_batch(batch: List[Tuple[str, DocumentNode, Dict[str, Any], asyncio.Future]]) -> None:
+    """
+    Sends a batch as one GitHub request and resolves each caller's future.
+    Request-wide failures are returned to every caller as-is; the queries are
+    only re-sent individually when an error is specific to some query but
+    can't be attributed to it.
+    """
+    try:
+        results = None
+        if len(batch) > 1:
+            merged_query, merged_variables = _merge_batch(batch)
+            logging.info(f"Sending {len(batch)} batched queries to GitHub as one request.")
+            body, merged = await make_github_request(merged_query, merged_variables, is_mutation=False)
+            if merged is None:
+                merged = await _loads(body)
+            if _is_request_failure(merged):
+                logging.warning("Batched GitHub request failed; returning the error to every query.")
+                results = [(body, merged)] * len(batch)
+            else:
+                split = _split_batch_result(merged, len(batch))
+                if split is None:
+                    logging.warning("Batched GitHub request failed as a whole; retrying queries individually.")
+                elif len(body) > LARGE_RESPONSE_BYTES:
+                    results = await asyncio.to_thread(lambda: [(orjson.dumps(result), result) for result in split])
                 else:
-                    pass
-            except json.JSONDecodeError:
-                 pass
+                    results = [(orjson.dumps(result), result) for result in split]
+        if results is None:
+            results = await asyncio.gather(*(make_github_request(query, variables, is_mutation=False) for query, _, variables, _ in batch))
+        for (_, _, _, fut), response in zip(batch, results):
+            if not fut.done():
+                fut.set_result(response)
+    except Exception as e:
+        logging.error(f"Error while sending batched GitHub request: {e}", exc_info=True)
+        for _, _, _, fut in batch:
+            if not fut.done():
+                fut.set_result(_error_response(f"An unexpected error occurred: {e}"))
 
-            return {"errors": [{"message": error_detail}]}
-        except Exception as e:
-            logging.error(f"Generic Error during GitHub request: {e}", exc_info=True)
-            return {"errors": [{"message": f"An unexpected error occurred: {e}"}]}
+def _spawn_batch(batch: List[Tuple[str, DocumentNode, Dict[str, Any], asyncio.Future]]) -> None:
+    task = asyncio.create_task(_send_batch(batch))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+
+async def _batch_window_elapsed() -> None:
+    """
+    Waits for the batching window, then sends whatever has been queued.
+    """
+    global _batch_timer
+    try:
+        await asyncio.sleep(BATCH_WINDOW_MS / 1000)
+    finally:
+        _batch_timer = None
+    if _batch_queue:
+        batch = _batch_queue[:]
+        _batch_queue.clear()
+        await _send_batch(batch)
+
+async def execute_query(query: str, variables: Optional[Dict[str, Any]] = None,
+                        fingerprint: Optional[int] = None) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """
+    Executes a read-only query, merging it with other queries that arrive
+    within the batching window when batching is enabled. Returns the same
+    (body, parsed) pair as make_github_request.
+    """
+    if BATCH_WINDOW_MS <= 0:
+        return await make_github_request(query, variables, is_mutation=False)
+    if fingerprint is None:
+        fingerprint = _fingerprint(query.encode())
+    entry = _batch_documents.get(fingerprint)
+    if entry is None or entry[0] != query:
+        entry = _batch_documents[fingerprint] = (query, _parse_batchable(query))
+    document = entry[1]
+    if document is None:
+        return await make_github_request(query, variables, is_mutation=False)
+
+    global _batch_timer
+    fut = asyncio.get_running_loop().create_future()
+    _batch_queue.append((query, document, variables or {}, fut))
+    if len(_batch_queue) >= BATCH_MAX_SIZE:
+        batch = _batch_queue[:]
+        _batch_queue.clear()
+        _spawn_batch(batch)
+    elif _batch_timer is None:
+        _batch_timer = asyncio.create_task(_batch_window_elapsed())
+    return await fut
+
+def _cached_response(key: Tuple[int, int], query: str, variables: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns the cached response for a query, if any. The stored query text and
+    variables must match, so a fingerprint collision is treated as a miss.
+    """
+    entry = _introspection_cache.get(key)
+    if entry is not None and entry[1] == query and entry[2] == variables:
+        return entry[3]
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == query and entry[1] == variables:
+        return entry[2]
+    return None
+
+def _invalidate_cache() -> None:
+    """
+    Drops cached and in-flight read results after a mutation so subsequent
+    reads see its effects. Introspection results are unaffected.
+    """
+    global _cache_generation
+    _cache_generation += 1
+    _cache.clear()
+    _inflight.clear()
+
+async def _fetch_and_cache(key: Tuple[int, int], query: str, variables: Optional[Dict[str, Any]],
+                           fingerprint: int, is_introspection: bool) -> str:
+    """
+    Runs a read-only query and caches its response if it has no errors.
+    Shared by all concurrent callers of the same query (singleflight).
+    """
+    # Make the API call (possibly merged into a batch with other queries)
+    generation = _cache_generation
+    body, result = await execute_query(query, variables, fingerprint)
+
+    # Pass GitHub's JSON through as-is rather than re-serializing it
+    response_json = await _decode(body)
+    if (result is None or "errors" not in result) and len(body) <= MAX_CACHED_RESPONSE_BYTES:
+        if is_introspection:
+            _introspection_cache[key] = (time.time(), query, variables or {}, response_json)
+            await asyncio.to_thread(_persist_introspection, key, query, variables or {}, body)
+        elif CACHE_TTL > 0 and generation == _cache_generation:
+            _cache[key] = (query, variables or {}, response_json)
+    return response_json
 
 @mcp.tool()
 async def github_execute_graphql(query: str, variables: Dict[str, Any] = None) -> str:
@@ -276,15 +911,47 @@ async def github_execute_graphql(query: str, variables: Dict[str, Any] = None) -
     """
     if not query:
         logging.warning("Received empty query for github_execute_graphql.")
-        return json.dumps({"errors": [{"message": "Query cannot be empty."}]})
+        return _ERR_EMPTY_QUERY
+    if not _HAS_TOKEN:
+        logging.error("GitHub API token is missing. Cannot make request.")
+        return _ERR_MISSING_TOKEN
 
     logging.info(f"Executing github_execute_graphql with query starting: {query[:50]}...")
 
-    # Make the API call
-    result = await make_github_request(query, variables)
+    fingerprint, is_mutation, is_introspection = _classify_query(query)
 
-    # Return the raw result as JSON
-    return json.dumps(result)
+    # Mutations have side effects and must always reach GitHub unbatched
+    if is_mutation:
+        body, _ = await make_github_request(query, variables, is_mutation=True)
+        _invalidate_cache()
+        return await _decode(body)
+
+    try:
+        key = _cache_key(fingerprint, variables)
+    except TypeError as e:
+        # orjson rejects e.g. integers beyond 64 bits; GitHub couldn't be sent
+        # these variables either
+        logging.warning(f"Could not serialize variables for github_execute_graphql: {e}")
+        body, _ = _error_response(f"Variables could not be serialized to JSON: {e}")
+        return body.decode()
+    cached = _cached_response(key, query, variables or {})
+    if cached is not None:
+        logging.debug("Serving github_execute_graphql result from cache.")
+        return cached
+
+    # The request runs in its own task so that cancelling any one caller,
+    # including the one that started it, doesn't cancel it for the others
+    inflight = _inflight.get(key)
+    if inflight is not None and inflight[0] == query and inflight[1] == (variables or {}):
+        logging.debug("Joining in-flight github_execute_graphql request.")
+        task = inflight[2]
+    else:
+        task = asyncio.create_task(_fetch_and_cache(key, query, variables, fingerprint, is_introspection))
+        if inflight is None:
+            _inflight[key] = (query, variables or {}, task)
+            task.add_done_callback(
+                lambda done: _inflight.pop(key) if key in _inflight and _inflight[key][2] is done else None)
+    return await asyncio.shield(task)
 
 if __name__ == "__main__":
     logging.info("Attempting to run GitHub GraphQL MCP server via stdio...")
@@ -294,8 +961,10 @@ if __name__ == "__main__":
         sys.exit(1)
     else:
         logging.info(f"Configured for GitHub GraphQL API with token: {GITHUB_TOKEN[:4]}...")
+        if uvloop is not None:
+            logging.info("Using uvloop event loop.")
         try:
-            mcp.run(transport='stdio')
+            anyio.run(mcp.run_stdio_async, backend_options={"use_uvloop": uvloop is not None})
             logging.info("Server stopped.")
         except Exception as e:
             logging.exception("Error running server")
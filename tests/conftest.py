@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The server is a single top-level module; make it importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,130 @@
+from graphql import parse
+
+import github_graphql_mcp_server as server
+
+
+def _batch(*queries):
+    """Builds batch entries (query, document, variables, future) for _merge_batch."""
+    return [(query, server._parse_batchable(query), variables, None) for query, variables in queries]
+
+
+def test_parse_batchable_accepts_single_query_with_fields():
+    assert server._parse_batchable("query { viewer { login } }") is not None
+
+
+def test_parse_batchable_rejects_unsafe_documents():
+    assert server._parse_batchable("mutation { addStar(input: {}) { clientMutationId } }") is None
+    assert server._parse_batchable("query A { viewer { login } } query B { viewer { name } }") is None
+    assert server._parse_batchable("query @cached { viewer { login } }") is None
+    assert server._parse_batchable("query { ...F } fragment F on Query { viewer { login } }") is None
+    assert server._parse_batchable("query { viewer {") is None
+
+
+def test_merge_prefixes_root_fields_and_keeps_existing_aliases():
+    query, variables = server._merge_batch(_batch(
+        ("{ viewer { login } }", {}),
+        ("{ me: viewer { name } }", {}),
+    ))
+    operation = parse(query).definitions[0]
+    fields = [(f.alias.value, f.name.value) for f in operation.selection_set.selections]
+    assert fields == [("gh0_viewer", "viewer"), ("gh1_me", "viewer")]
+    assert variables == {}
+
+
+def test_merge_renames_variables_in_definitions_and_usages():
+    query, variables = server._merge_batch(_batch(
+        ("query A($login: String!) { user(login: $login) { name } }", {"login": "octocat"}),
+        ("query B($login: String!, $first: Int = 5) { user(login: $login) { repositories(first: $first) { totalCount } } }",
+         {"login": "hubot"}),
+    ))
+    assert "$gh0_login: String!" in query
+    assert "$gh1_login: String!" in query
+    assert "$gh1_first: Int = 5" in query
+    assert "user(login: $gh0_login)" in query
+    assert "repositories(first: $gh1_first)" in query
+    assert "$login" not in query
+    # Variables left to their defaults are not sent
+    assert variables == {"gh0_login": "octocat", "gh1_login": "hubot"}
+
+
+def test_merge_renames_fragments_with_the_same_name():
+    query, _ = server._merge_batch(_batch(
+        ("{ viewer { ...F } } fragment F on User { login }", {}),
+        ("{ viewer { ...F } } fragment F on User { name }", {}),
+    ))
+    document = parse(query)
+    fragments = {d.name.value: d for d in document.definitions[1:]}
+    assert set(fragments) == {"gh0_F", "gh1_F"}
+    assert "...gh0_F" in query and "...gh1_F" in query
+    assert "...F\n" not in query
+
+
+def test_split_routes_data_by_alias_prefix():
+    results = server._split_batch_result({"data": {
+        "gh0_viewer": {"login": "octocat"},
+        "gh1_me": {"name": "Mona"},
+        "gh10_repository_owner": {"login": "github"},
+    }}, 11)
+    assert results[0] == {"data": {"viewer": {"login": "octocat"}}}
+    assert results[1] == {"data": {"me": {"name": "Mona"}}}
+    assert results[10] == {"data": {"repository_owner": {"login": "github"}}}
+    assert results[2] == {"data": {}}
+
+
+def test_split_attributes_errors_and_strips_prefix_from_path():
+    results = server._split_batch_result({
+        "data": {"gh0_viewer": {"login": "octocat"}, "gh1_user": None},
+        "errors": [{"message": "Could not resolve to a User", "path": ["gh1_user", "name"], "type": "NOT_FOUND",
+                    "locations": [{"line": 7, "column": 3}]}],
+    }, 2)
+    assert results[0] == {"data": {"viewer": {"login": "octocat"}}}
+    assert results[1] == {
+        "data": {"user": None},
+        "errors": [{"message": "Could not resolve to a User", "path": ["user", "name"], "type": "NOT_FOUND"}],
+    }
+
+
+def test_split_gives_up_on_errors_without_a_query_path():
+    assert server._split_batch_result({
+        "data": {"gh0_viewer": {"login": "octocat"}},
+        "errors": [{"message": "Variable $gh1_login of type String! was provided invalid value"}],
+    }, 2) is None
+    assert server._split_batch_result({
+        "data": {"gh0_viewer": {"login": "octocat"}},
+        "errors": [{"message": "boom", "path": ["viewer"]}],
+    }, 1) is None
+
+
+def test_split_gives_up_when_data_is_null():
+    assert server._split_batch_result({
+        "data": None,
+        "errors": [{"message": "boom", "path": ["gh1_viewer", "x"]}],
+    }, 2) is None
+    assert server._split_batch_result({"errors": [{"message": "HTTP Status Error: 502"}]}, 2) is None
+
+
+def test_merge_then_split_round_trip():
+    batch = _batch(
+        ("query($o: String!) { repository(owner: $o, name: \"x\") { ...R } } fragment R on Repository { name }", {"o": "me"}),
+        ("{ me: viewer { login } }", {}),
+    )
+    query, _ = server._merge_batch(batch)
+    aliases = [f.alias.value for f in parse(query).definitions[0].selection_set.selections]
+    response = {"data": {aliases[0]: {"name": "x"}, aliases[1]: {"login": "me"}}}
+    assert server._split_batch_result(response, len(batch)) == [
+        {"data": {"repository": {"name": "x"}}},
+        {"data": {"me": {"login": "me"}}},
+    ]
+
+
+def test_request_failures_are_not_split_or_resent():
+    assert server._is_request_failure({"errors": [{"message": "HTTP Status Error: 502"}]})
+    assert server._is_request_failure({"errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]})
+    assert server._is_request_failure({"data": None, "errors": [{"message": "Something went wrong while executing your query."}]})
+    # Errors tied to a query (validation with locations, or a path) are not request-wide
+    assert not server._is_request_failure({"errors": [
+        {"message": "Field 'nope' doesn't exist on type 'User'", "locations": [{"line": 3, "column": 5}],
+         "extensions": {"code": "undefinedField"}},
+    ]})
+    assert not server._is_request_failure({"data": {}, "errors": [{"message": "boom", "path": ["gh0_viewer"]}]})
+    assert not server._is_request_failure({"data": {"gh0_viewer": {}}})
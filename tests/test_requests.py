@@ -0,0 +1,200 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+import github_graphql_mcp_server as server
+
+
+class _Clock:
+    """Stands in for the server's time module; sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = time.time()
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(server, "time", clock)
+    monkeypatch.setattr(server.asyncio, "sleep", clock.sleep)
+    monkeypatch.setattr(server, "_backoff_delay", lambda attempt: 1.0)
+    monkeypatch.setattr(server, "_rl", {"remaining": None, "reset": 0})
+    return clock
+
+
+def _mock_client(monkeypatch, *responses):
+    """Installs a client that replays responses (or raises exceptions) in order and records requests."""
+    requests = []
+    pending = list(responses)
+
+    def handler(request):
+        requests.append(request)
+        response = pending.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(server, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return requests
+
+
+def _post(is_mutation):
+    return asyncio.run(server._post_with_retries(b'{"query": "{ viewer { login } }"}', is_mutation))
+
+
+def test_mutation_is_not_retried_on_gateway_errors(monkeypatch, clock):
+    for status in (502, 503, 504):
+        requests = _mock_client(monkeypatch, httpx.Response(status))
+        assert _post(is_mutation=True).status_code == status
+        assert len(requests) == 1
+    assert clock.sleeps == []
+
+
+def test_query_is_retried_on_gateway_errors(monkeypatch, clock):
+    requests = _mock_client(monkeypatch, httpx.Response(502), httpx.Response(503), httpx.Response(200))
+    assert _post(is_mutation=False).status_code == 200
+    assert len(requests) == 3
+    assert clock.sleeps == [1.0, 1.0]
+
+
+def test_mutation_is_retried_on_connect_errors(monkeypatch, clock):
+    for error in (httpx.ConnectError("refused"), httpx.ConnectTimeout("timed out")):
+        requests = _mock_client(monkeypatch, error, httpx.Response(200))
+        assert _post(is_mutation=True).status_code == 200
+        assert len(requests) == 2
+
+
+def test_mutation_is_not_retried_once_the_request_may_have_been_sent(monkeypatch, clock):
+    requests = _mock_client(monkeypatch, httpx.ReadTimeout("timed out"), httpx.Response(200))
+    with pytest.raises(httpx.ReadTimeout):
+        _post(is_mutation=True)
+    assert len(requests) == 1
+
+
+def test_mutation_is_retried_after_429(monkeypatch, clock):
+    requests = _mock_client(monkeypatch, httpx.Response(429, headers={"Retry-After": "7"}), httpx.Response(200))
+    assert _post(is_mutation=True).status_code == 200
+    assert len(requests) == 2
+    assert clock.sleeps == [7.0]
+
+
+def test_retry_after_wait_beyond_limit_is_not_retried(monkeypatch, clock):
+    requests = _mock_client(monkeypatch, httpx.Response(429, headers={"Retry-After": "3600"}), httpx.Response(200))
+    assert _post(is_mutation=False).status_code == 429
+    assert len(requests) == 1
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert server._parse_retry_after("120") == 120.0
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert server._parse_retry_after(retry_at) == pytest.approx(30, abs=2)
+    assert server._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert server._parse_retry_after("soon") is None
+    assert server._parse_retry_after(None) is None
+
+
+def test_exhausted_primary_limit_waits_until_reset(monkeypatch, clock):
+    start = clock.now
+    reset = int(start) + 10
+    exhausted = httpx.Response(403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)})
+    requests = _mock_client(monkeypatch, exhausted, httpx.Response(200))
+    assert _post(is_mutation=False).status_code == 200
+    assert len(requests) == 2
+    # Pacing doesn't add a second wait once the reset time has passed
+    assert clock.sleeps == [pytest.approx(reset - start)]
+
+
+def test_plain_403_is_not_retried(monkeypatch, clock):
+    requests = _mock_client(monkeypatch, httpx.Response(403), httpx.Response(200))
+    assert _post(is_mutation=False).status_code == 403
+    assert len(requests) == 1
+
+
+def test_analyse_query():
+    assert server._analyse_query("query { viewer { login } }") == (False, False)
+    assert server._analyse_query("mutation { addStar(input: {}) { clientMutationId } }") == (True, False)
+    assert server._analyse_query("subscription { viewer { login } }") == (True, False)
+    assert server._analyse_query("{ __schema { types { name } } }") == (False, True)
+    assert server._analyse_query('{ __type(name: "Repository") { name } __typename }') == (False, True)
+    # Real data next to introspection fields is user-specific
+    assert server._analyse_query("{ __typename viewer { login } }") == (False, False)
+    # Keywords inside strings or comments don't change the operation type
+    assert server._analyse_query('# mutation\n{ repository(owner: "a", name: "mutation") { name } }') == (False, False)
+    # Unparseable documents are treated as mutations so they are never cached or retried
+    assert server._analyse_query("query { viewer {") == (True, False)
+
+
+@pytest.fixture
+def empty_caches():
+    server._cache.clear()
+    server._introspection_cache.clear()
+    server._inflight.clear()
+    yield
+    server._cache.clear()
+    server._introspection_cache.clear()
+    server._inflight.clear()
+
+
+def test_singleflight_survives_cancellation_of_first_caller(monkeypatch, empty_caches):
+    body = b'{"data":{"viewer":{"login":"octocat"}}}'
+    calls = []
+    monkeypatch.setattr(server, "_HAS_TOKEN", True)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def fake_execute_query(query, variables=None, fingerprint=None):
+            calls.append(query)
+            await release.wait()
+            return body, None
+
+        monkeypatch.setattr(server, "execute_query", fake_execute_query)
+        query = "query { viewer { login } }"
+        first = asyncio.create_task(server.github_execute_graphql(query))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(server.github_execute_graphql(query))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == body.decode()
+    assert len(calls) == 1
+
+
+def test_disk_loaded_introspection_expires_from_original_write_time(monkeypatch, tmp_path, empty_caches):
+    monkeypatch.setattr(server, "_INTROSPECTION_PATH", tmp_path)
+    query = "{ __schema { queryType { name } } }"
+    body = b'{"data":{"__schema":{"queryType":{"name":"Query"}}}}'
+    fresh_key, stale_key = (1, 2), (3, 4)
+    server._persist_introspection(fresh_key, query, {}, body)
+    server._persist_introspection(stale_key, query, {}, body)
+    fresh_path, stale_path = sorted(tmp_path.iterdir())
+    now = time.time()
+    # Written long enough ago that it has one minute left
+    os.utime(fresh_path, (now, now - server.INTROSPECTION_TTL + 60))
+    os.utime(stale_path, (now, now - server.INTROSPECTION_TTL - 60))
+
+    server._load_persisted_introspection()
+
+    assert server._cached_response(fresh_key, query, {}) == body.decode()
+    assert server._cached_response(fresh_key, "{ __typename }", {}) is None
+    assert server._cached_response(stale_key, query, {}) is None
+    assert not stale_path.exists()
+    server._introspection_cache.expire(now + 61)
+    assert server._cached_response(fresh_key, query, {}) is None